@@ -1,17 +1,59 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
 import os
 from data_storage import load_activity_data, DATA_FILE, DATA_DIR
-from screenshot_capture import SCREENSHOT_DIR # To build image paths
+from screenshot_capture import SCREENSHOT_DIR, thumbnail_path_for # To build image paths
 
 st.set_page_config(layout="wide")
 
 st.title("AI Task Tracker Analysis")
 
 # --- Load Data ---
+@st.cache_data(show_spinner=False, max_entries=1) # Only the current file version is ever read again
+def get_activity_data(data_file_mtime):
+    """Cached loader; the data file's mtime is the cache key so reruns only reload after new writes."""
+    return load_activity_data().sort_values(by="Timestamp", ignore_index=True) # Sorted once, per file change
+
+def downsample_timeline(df, n_buckets):
+    """Keeps one point per topic per time bucket so the timeline sends ~pixel-column-many points."""
+    ts = df['Timestamp']
+    span = (ts.max() - ts.min()) or pd.Timedelta(seconds=1)
+    bucket = ((ts - ts.min()) / span * (n_buckets - 1)).astype(int)
+    return df[~pd.DataFrame({'MainTopic': df['MainTopic'], 'Bucket': bucket}).duplicated()]
+
+# --- Cached Aggregations ---
+# `_df` is not hashed by Streamlit (leading underscore); `filter_key` identifies the filtered data
+# instead (data file mtime + sidebar selections), so reruns from other widgets hit the cache.
+# The key changes with every tracker flush, so only the most recent few filter combinations are kept.
+AGGREGATION_CACHE_ENTRIES = 8
+
+@st.cache_data(show_spinner=False, max_entries=AGGREGATION_CACHE_ENTRIES)
+def compute_topic_time(_df, filter_key, max_continuous_minutes):
+    """Approximate minutes per topic from gaps between consecutive same-topic entries. Expects _df sorted by topic, then time."""
+    # Diff against the previous row wherever it has the same topic (no groupby pass)
+    same_topic = _df['MainTopic'].eq(_df['MainTopic'].shift())
+    time_diff = _df['Timestamp'].diff().where(same_topic)
+    # NaT gaps compare False in the mask, so they fall through to 0 like long gaps do
+    is_continuous = time_diff.le(pd.Timedelta(minutes=max_continuous_minutes))
+    duration = time_diff.dt.total_seconds().div(60).where(is_continuous, 0.0).fillna(0.0)
+
+    topic_time = duration.groupby(_df['MainTopic'], observed=True).sum().rename('Duration').reset_index()
+    topic_time = topic_time[topic_time['Duration'] > 0] # Filter out topics with no calculated duration
+    return topic_time.sort_values(by='Duration', ascending=False)
+
+@st.cache_data(show_spinner=False, max_entries=AGGREGATION_CACHE_ENTRIES)
+def compute_topic_counts(_df, filter_key):
+    """Number of activity records per topic."""
+    topic_counts = _df['MainTopic'].value_counts().reset_index()
+    topic_counts.columns = ['MainTopic', 'Count']
+    topic_counts = topic_counts[topic_counts['Count'] > 0] # Categorical value_counts also lists unused topics
+    return topic_counts.sort_values(by='Count', ascending=False)
+
 st.header("Activity Log")
-df = load_activity_data()
+data_file_mtime = os.path.getmtime(DATA_FILE) if os.path.exists(DATA_FILE) else None
+df = get_activity_data(data_file_mtime)
 
 if df.empty:
     st.warning(f"No activity data found in '{DATA_FILE}'. Run the main tracker script (`main.py`) first.")
@@ -20,16 +62,16 @@ if df.empty:
 # Convert Timestamp if it's not already datetime (might happen if load fails partially)
 if 'Timestamp' in df.columns and not pd.api.types.is_datetime64_any_dtype(df['Timestamp']):
      df['Timestamp'] = pd.to_datetime(df['Timestamp'], errors='coerce')
-     df = df.dropna(subset=['Timestamp']) # Remove rows where conversion failed
+     df = df.dropna(subset=['Timestamp']).sort_values(by="Timestamp", ignore_index=True) # Remove rows where conversion failed
 
 # --- Display Raw Data ---
-st.dataframe(df.sort_values(by="Timestamp", ascending=False))
+st.dataframe(df.iloc[::-1]) # Newest first; df is already sorted by Timestamp
 
 # --- Data Filtering ---
 st.sidebar.header("Filters")
 # Date Range Filter
-min_date = df['Timestamp'].min().date()
-max_date = df['Timestamp'].max().date()
+min_date = df['Timestamp'].iloc[0].date() # df is sorted, so the range ends are positional lookups
+max_date = df['Timestamp'].iloc[-1].date()
 selected_date_range = st.sidebar.date_input(
     "Select Date Range",
     value=(min_date, max_date),
@@ -46,7 +88,7 @@ else:
     df_filtered = df.copy() # Show all data if range is invalid
 
 # Main Topic Filter
-topics = sorted(df_filtered['MainTopic'].unique())
+topics = sorted(df_filtered['MainTopic'].cat.remove_unused_categories().cat.categories.tolist())
 topics_with_all = ["Select All"] + topics  # Add "Select All" option
 selected_topics = st.sidebar.multiselect("Filter by Main Topic", options=topics_with_all, default=["Select All"])
 
@@ -54,8 +96,11 @@ if "Select All" in selected_topics:
     # Keep all topics if "Select All" is selected
     pass
 else:
-    # Filter by selected topics
-    df_filtered = df_filtered[df_filtered['MainTopic'].isin(selected_topics)]
+    # Filter by selected topics, comparing integer category codes rather than hashing strings
+    topic_column = df_filtered['MainTopic']
+    selected_codes = topic_column.cat.categories.get_indexer(selected_topics)
+    selected_codes = selected_codes[selected_codes >= 0] # -1 means "not found", which is also the code for missing topics
+    df_filtered = df_filtered[np.isin(topic_column.cat.codes.to_numpy(), selected_codes)]
 
 
 if df_filtered.empty and not df.empty:
@@ -65,100 +110,111 @@ elif df_filtered.empty:
      st.warning("No data available.") # Should have been caught earlier, but just in case
      st.stop()
 
+# Identifies the filtered data for the cached aggregations above
+filter_key = (data_file_mtime, tuple(str(d) for d in selected_date_range), tuple(selected_topics))
+
+# Sorted by topic, then time: the time-per-topic estimate and the screenshot list both use this order
+df_filtered = df_filtered.sort_values(by=['MainTopic', 'Timestamp'], kind='stable')
 
-# Create tabs for analysis and screenshot viewer
-analysis_tab, screenshot_tab = st.tabs(["Analysis", "Screenshot Viewer"])
+# Create tabs for analysis and screenshot viewer. Tracking the selected tab (on_change="rerun")
+# lets each rerun skip building the content of the tab that isn't visible.
+analysis_tab, screenshot_tab = st.tabs(["Analysis", "Screenshot Viewer"], key="active_tab", on_change="rerun")
 
 # --- Visualizations ---
 with analysis_tab:
-    st.header("Analysis")
-
-    # 1. Time Spent per Topic (Approximate)
-    st.subheader("Approximate Time Spent per Topic")
-    # Calculate time difference between consecutive entries for the *same* topic
-    # This is an approximation, assuming continuous work between screenshots of the same topic
-    df_filtered = df_filtered.sort_values(by=['MainTopic', 'Timestamp'])
-    df_filtered['TimeDiff'] = df_filtered.groupby('MainTopic')['Timestamp'].diff()
-
-    # Define a reasonable max duration between screenshots to consider it "continuous"
-    MAX_CONTINUOUS_MINUTES = 10 # Adjust as needed
-    df_filtered['Duration'] = df_filtered['TimeDiff'].apply(
-        lambda x: x.total_seconds() / 60 if pd.notnull(x) and x <= pd.Timedelta(minutes=MAX_CONTINUOUS_MINUTES) else 0
-    )
-
-    topic_time = df_filtered.groupby('MainTopic')['Duration'].sum().reset_index()
-    topic_time = topic_time[topic_time['Duration'] > 0] # Filter out topics with no calculated duration
-    topic_time = topic_time.sort_values(by='Duration', ascending=False)
-
-    if not topic_time.empty:
-        fig_topic_time = px.bar(topic_time, x='MainTopic', y='Duration', title="Time per Topic (Minutes)",
-                              labels={'Duration': 'Total Minutes (Approx.)', 'MainTopic': 'Topic'})
-        st.plotly_chart(fig_topic_time, use_container_width=True)
-    else:
-        st.info("Not enough consecutive data points to estimate time spent per topic with current filters.")
-
-
-    # 2. Activity Count per Main Topic
-    st.subheader("Activity Count per Main Topic")
-    topic_counts = df_filtered['MainTopic'].value_counts().reset_index()
-    topic_counts.columns = ['MainTopic', 'Count']
-    topic_counts = topic_counts.sort_values(by='Count', ascending=False)
-
-    if not topic_counts.empty:
-        fig_topic_counts = px.pie(topic_counts, names='MainTopic', values='Count', title="Activities per Main Topic")
-        st.plotly_chart(fig_topic_counts, use_container_width=True)
-    else:
-         st.info("No topic data available for the selected filters.")
-
-
-    # 3. Timeline of Activities
-    st.subheader("Activity Timeline")
-    if not df_filtered.empty:
-        # Ensure ScreenshotFile column exists
-        if 'ScreenshotFile' not in df_filtered.columns:
-            df_filtered['ScreenshotFile'] = None # Add dummy column if missing
-
-        # Create hover text
-        df_filtered['HoverText'] = df_filtered.apply(
-            lambda row: f"Time: {row['Timestamp'].strftime('%H:%M:%S')}<br>"
-                        f"App: {row['AppName']}<br>"
-                        f"Topic: {row['MainTopic']}<br>"
-                        f"Desc: {row['CrispDescription']}",
-            axis=1
-        )
-        fig_timeline = px.scatter(df_filtered, x='Timestamp', y='MainTopic', 
-                                  title="Activity Timeline by Main Topic",
-                                  hover_data=['HoverText'],
-                                  labels={'MainTopic': 'Topic', 'Timestamp': 'Time'})
-        fig_timeline.update_layout(xaxis_title="Time", yaxis_title="Topic")
-        st.plotly_chart(fig_timeline, use_container_width=True)
-    else:
-        st.info("No data points available for the timeline with current filters.")
+    if analysis_tab.open:
+        st.header("Analysis")
+
+        # 1. Time Spent per Topic (Approximate)
+        st.subheader("Approximate Time Spent per Topic")
+        # Time is approximated from gaps between consecutive entries for the *same* topic,
+        # assuming continuous work between screenshots of the same topic.
+        # Define a reasonable max duration between screenshots to consider it "continuous"
+        MAX_CONTINUOUS_MINUTES = 10 # Adjust as needed
+        topic_time = compute_topic_time(df_filtered, filter_key, MAX_CONTINUOUS_MINUTES)
+
+        if not topic_time.empty:
+            fig_topic_time = px.bar(topic_time, x='MainTopic', y='Duration', title="Time per Topic (Minutes)",
+                                  labels={'Duration': 'Total Minutes (Approx.)', 'MainTopic': 'Topic'})
+            st.plotly_chart(fig_topic_time, use_container_width=True)
+        else:
+            st.info("Not enough consecutive data points to estimate time spent per topic with current filters.")
+
+
+        # 2. Activity Count per Main Topic
+        st.subheader("Activity Count per Main Topic")
+        topic_counts = compute_topic_counts(df_filtered, filter_key)
+
+        if not topic_counts.empty:
+            fig_topic_counts = px.pie(topic_counts, names='MainTopic', values='Count', title="Activities per Main Topic")
+            st.plotly_chart(fig_topic_counts, use_container_width=True)
+        else:
+             st.info("No topic data available for the selected filters.")
+
+
+        # 3. Timeline of Activities
+        st.subheader("Activity Timeline")
+        MAX_TIMELINE_POINTS = 5000 # Above this, downsample before handing the data to Plotly
+        TIMELINE_BUCKETS = 2000 # Roughly the horizontal pixel width of the chart
+        if not df_filtered.empty:
+            # Ensure ScreenshotFile column exists
+            if 'ScreenshotFile' not in df_filtered.columns:
+                df_filtered['ScreenshotFile'] = None # Add dummy column if missing
+
+            # Create hover text (column-wise string concatenation, no per-row Python calls).
+            # Missing values are blanked first: object dtype so fillna("") also works on the Categoricals.
+            df_filtered['HoverText'] = (
+                "Time: " + df_filtered['Timestamp'].dt.strftime('%H:%M:%S')
+                + "<br>App: " + df_filtered['AppName'].astype(object).fillna("").astype(str)
+                + "<br>Topic: " + df_filtered['MainTopic'].astype(object).fillna("").astype(str)
+                + "<br>Desc: " + df_filtered['CrispDescription'].astype(object).fillna("").astype(str)
+            )
+            # Every topic sits on its own row, so one marker per (topic, pixel column) is visually lossless
+            df_timeline = df_filtered
+            if len(df_timeline) > MAX_TIMELINE_POINTS:
+                df_timeline = downsample_timeline(df_timeline, TIMELINE_BUCKETS)
+            fig_timeline = px.scatter(df_timeline, x='Timestamp', y='MainTopic', 
+                                      title="Activity Timeline by Main Topic",
+                                      hover_data=['HoverText'],
+                                      labels={'MainTopic': 'Topic', 'Timestamp': 'Time'},
+                                      render_mode='webgl') # Scattergl: GPU-drawn markers instead of SVG nodes
+            fig_timeline.update_layout(xaxis_title="Time", yaxis_title="Topic")
+            st.plotly_chart(fig_timeline, use_container_width=True)
+        else:
+            st.info("No data points available for the timeline with current filters.")
 
 
 # --- Screenshot Viewer ---
 with screenshot_tab:
-    st.header("Screenshot Viewer")
-    if 'ScreenshotFile' in df_filtered.columns and not df_filtered['ScreenshotFile'].isnull().all():
-        # Select a record to view screenshot
-        record_options = df_filtered.apply(lambda row: f"{row['Timestamp'].strftime('%Y-%m-%d %H:%M:%S')} - {row['AppName']} ({row['MainTopic']})", axis=1)
-        selected_record = st.selectbox("Select activity record to view screenshot:", options=record_options)
-
-        if selected_record:
-            # Find the corresponding row
-            selected_row = df_filtered[record_options == selected_record].iloc[0]
-            screenshot_filename = selected_row['ScreenshotFile']
-            if screenshot_filename and isinstance(screenshot_filename, str):
-                screenshot_path = os.path.join(SCREENSHOT_DIR, screenshot_filename)
-                if os.path.exists(screenshot_path):
-                    st.image(screenshot_path, caption=f"Screenshot for: {selected_record}", use_container_width=True)
-                    st.write(f"**Crisp Description:** {selected_row['CrispDescription']}")
-                    st.write(f"**Short Description:** {selected_row['ShortDescription']}")
+    if screenshot_tab.open:
+        st.header("Screenshot Viewer")
+        if 'ScreenshotFile' in df_filtered.columns and not df_filtered['ScreenshotFile'].isnull().all():
+            # Select a record to view screenshot
+            # Map each option label to its row position once, so a selection is a dict lookup
+            record_options = {}
+            for i, (ts, app_name, topic) in enumerate(zip(df_filtered['Timestamp'], df_filtered['AppName'], df_filtered['MainTopic'])):
+                record_options.setdefault(f"{ts:%Y-%m-%d %H:%M:%S} - {app_name} ({topic})", i) # Keep first row on duplicate labels
+            selected_record = st.selectbox("Select activity record to view screenshot:", options=list(record_options))
+
+            if selected_record:
+                # Find the corresponding row
+                selected_row = df_filtered.iloc[record_options[selected_record]]
+                screenshot_filename = selected_row['ScreenshotFile']
+                if screenshot_filename and isinstance(screenshot_filename, str):
+                    screenshot_path = os.path.join(SCREENSHOT_DIR, screenshot_filename)
+                    if os.path.exists(screenshot_path):
+                        # Serve the small JPEG preview unless the full PNG is requested (or no preview exists)
+                        thumbnail_path = thumbnail_path_for(screenshot_path)
+                        show_full_resolution = st.checkbox("View full resolution", value=False)
+                        image_path = screenshot_path if show_full_resolution or not os.path.exists(thumbnail_path) else thumbnail_path
+                        st.image(image_path, caption=f"Screenshot for: {selected_record}", use_container_width=True)
+                        st.write(f"**Crisp Description:** {selected_row['CrispDescription']}")
+                        st.write(f"**Short Description:** {selected_row['ShortDescription']}")
+                    else:
+                        st.warning(f"Screenshot file not found: {screenshot_path}")
                 else:
-                    st.warning(f"Screenshot file not found: {screenshot_path}")
-            else:
-                st.info("No screenshot file recorded for this entry.")
+                    st.info("No screenshot file recorded for this entry.")
 
-    else:
-        st.info("No screenshots available or 'ScreenshotFile' column missing in the filtered data.")
+        else:
+            st.info("No screenshots available or 'ScreenshotFile' column missing in the filtered data.")
 
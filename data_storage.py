@@ -1,68 +1,202 @@
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import os
+import atexit
 import logging
+import threading
+import time
 from datetime import datetime
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
 
-DATA_FILE = "data/activity_log.csv"
+DATA_FILE = "data/activity_log.parquet"
+LEGACY_CSV_FILE = "data/activity_log.csv" # Pre-Parquet log, migrated on first access
 DATA_DIR = "data"
 
+FLUSH_BATCH_SIZE = 16 # Rows buffered before they are written to DATA_FILE
+FLUSH_INTERVAL_SECONDS = 300 # ...or once this long has passed since the last flush
+
+# save_activity is called from the tracker's analysis worker threads; the
+# buffer and the read-modify-write of the Parquet file must not interleave.
+_write_lock = threading.Lock()
+_pending_rows = []
+_last_flush_time = time.monotonic()
+
+COLUMNS = ['Timestamp', 'AppName', 'CrispDescription', 'MainTopic', 'ShortDescription', 'ScreenshotFile']
+CATEGORICAL_COLUMNS = ['AppName', 'MainTopic']
+
+# Explicit on-disk schema so timestamps come back typed and the low-cardinality
+# columns are dictionary-encoded (read back by pandas as Categorical).
+ACTIVITY_SCHEMA = pa.schema([
+    ('Timestamp', pa.timestamp('ns')),
+    ('AppName', pa.dictionary(pa.int32(), pa.string())),
+    ('CrispDescription', pa.string()),
+    ('MainTopic', pa.dictionary(pa.int32(), pa.string())),
+    ('ShortDescription', pa.string()),
+    ('ScreenshotFile', pa.string()),
+])
+
 def ensure_data_dir_exists():
     """Creates the data directory if it doesn't exist."""
     if not os.path.exists(DATA_DIR):
         os.makedirs(DATA_DIR)
-        logging.info(f"Created directory: {DATA_DIR}")
+        logger.info(f"Created directory: {DATA_DIR}")
+
+def _empty_frame():
+    """Returns an empty DataFrame with the expected columns."""
+    return pd.DataFrame(columns=COLUMNS)
+
+def _to_table(df):
+    """Converts a DataFrame of activity rows to an Arrow table with ACTIVITY_SCHEMA."""
+    df = df[COLUMNS].copy()
+    df['Timestamp'] = pd.to_datetime(df['Timestamp'])
+    for col in COLUMNS[1:]:
+        # Arrow's string columns need plain strings, not whatever pandas inferred or the LLM returned
+        # (e.g. a list for a description), so stringify values the way the old CSV writer did
+        df[col] = df[col].astype(object).map(str, na_action='ignore').where(df[col].notna(), None)
+    return pa.Table.from_pandas(df, schema=ACTIVITY_SCHEMA, preserve_index=False)
+
+def _pending_table():
+    """Converts the buffered rows to a table, dropping any row that can't be converted.
+
+    A row that fails conversion would fail every later flush too, so it is logged and
+    discarded instead of being kept for a retry. Caller must hold _write_lock.
+    """
+    try:
+        return _to_table(pd.DataFrame(_pending_rows, columns=COLUMNS))
+    except Exception as e:
+        logger.error(f"Error converting buffered activity rows ({e}), checking them one by one")
+
+    convertible_rows = []
+    for row in _pending_rows:
+        try:
+            _to_table(pd.DataFrame([row], columns=COLUMNS))
+            convertible_rows.append(row)
+        except Exception as e:
+            logger.error(f"Dropping activity row that can't be saved: {row} ({e})")
+    _pending_rows[:] = convertible_rows
+    return _to_table(pd.DataFrame(convertible_rows, columns=COLUMNS))
+
+def _write_table(table):
+    """Writes the table to DATA_FILE atomically so readers never see a partial file."""
+    tmp_file = f"{DATA_FILE}.tmp"
+    pq.write_table(table, tmp_file)
+    os.replace(tmp_file, DATA_FILE)
+
+def _read_legacy_csv():
+    """Reads activity_log.csv, skipping malformed lines and rows whose timestamp can't be parsed."""
+    try:
+        legacy_df = pd.read_csv(LEGACY_CSV_FILE, encoding='utf-8', on_bad_lines='skip')
+    except pd.errors.EmptyDataError:
+        return _empty_frame()
+    legacy_df = legacy_df.reindex(columns=COLUMNS)
+    # The old writer stored str(datetime), which drops the microseconds when they are 0,
+    # so the format varies from row to row
+    raw_timestamps = legacy_df['Timestamp'].astype(str)
+    legacy_df['Timestamp'] = pd.to_datetime(raw_timestamps, format='ISO8601', errors='coerce')
+    # A line cut off mid-timestamp (tracker killed while writing) can still parse, as the wrong time
+    unparseable = legacy_df['Timestamp'].isna() | ~raw_timestamps.str.match(r"\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}")
+    if unparseable.any():
+        logger.warning(f"Skipping {unparseable.sum()} rows of {LEGACY_CSV_FILE} with unparseable timestamps")
+    return legacy_df[~unparseable]
+
+def migrate_legacy_csv():
+    """Converts an existing activity_log.csv to Parquet if no Parquet log exists yet.
+
+    Only the tracker's writes call this; the dashboard reads the CSV directly until then,
+    so the two processes never race to create DATA_FILE.
+    """
+    if os.path.exists(DATA_FILE) or not os.path.exists(LEGACY_CSV_FILE):
+        return
+    legacy_df = _read_legacy_csv()
+    _write_table(_to_table(legacy_df))
+    logger.info(f"Migrated {len(legacy_df)} records from {LEGACY_CSV_FILE} to {DATA_FILE}")
 
 def save_activity(timestamp, app_name, crisp_desc, main_topic, short_desc, screenshot_path):
-    """Appends the activity data to the CSV file."""
-    ensure_data_dir_exists()
-    file_exists = os.path.isfile(DATA_FILE)
-
-    data = {
-        'Timestamp': [timestamp],
-        'AppName': [app_name],
-        'CrispDescription': [crisp_desc],
-        'MainTopic': [main_topic],
-        'ShortDescription': [short_desc],
-        'ScreenshotFile': [os.path.basename(screenshot_path) if screenshot_path else None] # Store only filename
+    """Buffers the activity data and writes it to the Parquet file in batches."""
+    row = {
+        'Timestamp': timestamp,
+        'AppName': app_name,
+        'CrispDescription': crisp_desc,
+        'MainTopic': main_topic,
+        'ShortDescription': short_desc,
+        'ScreenshotFile': os.path.basename(screenshot_path) if screenshot_path else None # Store only filename
     }
-    df = pd.DataFrame(data)
+
+    with _write_lock:
+        _pending_rows.append(row)
+        if len(_pending_rows) >= FLUSH_BATCH_SIZE or time.monotonic() - _last_flush_time >= FLUSH_INTERVAL_SECONDS:
+            _flush_locked()
+
+def flush_pending():
+    """Writes any buffered activity rows to the Parquet file."""
+    with _write_lock:
+        _flush_locked()
+
+def _flush_locked():
+    """Appends all buffered rows as one batch. Caller must hold _write_lock."""
+    global _last_flush_time
+    _last_flush_time = time.monotonic()
+    if not _pending_rows:
+        return
+    ensure_data_dir_exists()
+
+    try:
+        migrate_legacy_csv()
+    except Exception as e:
+        # New rows are written regardless; the CSV is left in place untouched
+        logger.error(f"Error migrating {LEGACY_CSV_FILE} to {DATA_FILE}: {e}")
 
     try:
-        if not file_exists:
-            df.to_csv(DATA_FILE, index=False, encoding='utf-8')
-            logging.info(f"Created new data file: {DATA_FILE}")
+        new_table = _pending_table()
+        if not _pending_rows:
+            return
+        if not os.path.isfile(DATA_FILE):
+            _write_table(new_table)
+            logger.info(f"Created new data file: {DATA_FILE}")
         else:
-            # Append without writing header
-            df.to_csv(DATA_FILE, mode='a', header=False, index=False, encoding='utf-8')
-            logging.info(f"Appended data to {DATA_FILE}")
+            # Parquet files can't be appended in place, so rewrite with the new rows added
+            existing_table = pq.read_table(DATA_FILE, schema=ACTIVITY_SCHEMA)
+            _write_table(pa.concat_tables([existing_table, new_table]).unify_dictionaries())
+            logger.info(f"Appended {len(_pending_rows)} rows to {DATA_FILE}")
+        _pending_rows.clear()
     except Exception as e:
-        logging.error(f"Error saving data to {DATA_FILE}: {e}")
+        # Keep the rows buffered so the next flush retries them (I/O errors can be transient)
+        logger.error(f"Error saving data to {DATA_FILE}: {e}")
+
+atexit.register(flush_pending)
 
 def load_activity_data():
-    """Loads the activity data from the CSV file."""
+    """Loads the activity data from the Parquet file."""
     ensure_data_dir_exists()
-    if os.path.exists(DATA_FILE):
+
+    if os.path.exists(DATA_FILE) or os.path.exists(LEGACY_CSV_FILE):
         try:
-            df = pd.read_csv(DATA_FILE, encoding='utf-8')
-            # Attempt to convert Timestamp column to datetime objects
-            df['Timestamp'] = pd.to_datetime(df['Timestamp'])
-            logging.info(f"Loaded data from {DATA_FILE}")
+            if os.path.exists(DATA_FILE):
+                # Timestamps arrive already typed, no string parsing needed
+                df = pd.read_parquet(DATA_FILE, engine="pyarrow")
+                logger.info(f"Loaded data from {DATA_FILE}")
+            else:
+                # Not migrated yet (the tracker does that on its next write)
+                df = _read_legacy_csv().reset_index(drop=True)
+                logger.info(f"Loaded data from {LEGACY_CSV_FILE}")
+            # Low-cardinality columns as Categorical so groupby/filters work on integer codes
+            for col in CATEGORICAL_COLUMNS:
+                df[col] = df[col].astype('category')
             return df
-        except pd.errors.EmptyDataError:
-            logging.warning(f"Data file {DATA_FILE} is empty.")
-            return pd.DataFrame(columns=['Timestamp', 'AppName', 'CrispDescription', 'MainTopic', 'ShortDescription', 'ScreenshotFile'])
         except Exception as e:
-            logging.error(f"Error loading data from {DATA_FILE}: {e}")
-            return pd.DataFrame(columns=['Timestamp', 'AppName', 'CrispDescription', 'MainTopic', 'ShortDescription', 'ScreenshotFile']) # Return empty df on error
+            logger.error(f"Error loading activity data: {e}")
+            return _empty_frame() # Return empty df on error
     else:
-        logging.info(f"Data file {DATA_FILE} does not exist yet.")
+        logger.info(f"Data file {DATA_FILE} does not exist yet.")
         # Return an empty DataFrame with the expected columns
-        return pd.DataFrame(columns=['Timestamp', 'AppName', 'CrispDescription', 'MainTopic', 'ShortDescription', 'ScreenshotFile'])
+        return _empty_frame()
 
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
     # Example usage
     print("Attempting to load data...")
     df_loaded = load_activity_data()
@@ -72,7 +206,8 @@ if __name__ == '__main__':
     # Example save
     # now = datetime.now()
     # save_activity(now, "Example App", "Doing example task", "Example", "Short example", "data/screenshots/fake_screenshot.png")
-    # print("Saved dummy record (check data/activity_log.csv)")
+    # flush_pending()
+    # print("Saved dummy record (check data/activity_log.parquet)")
     # df_reloaded = load_activity_data()
     # print(f"Loaded {len(df_reloaded)} records after save.")
     # print(df_reloaded.tail())
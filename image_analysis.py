@@ -1,15 +1,19 @@
 import os
-import base64
+import io
 import json
+import orjson
+import pybase64 # SIMD-accelerated drop-in for base64
 import logging
-from openai import AzureOpenAI, OpenAI # Use AzureOpenAI if using Azure endpoint
+import httpx
+from PIL import Image
+from openai import AzureOpenAI, OpenAI, DefaultHttpxClient # Use AzureOpenAI if using Azure endpoint
 from topic_normalizer import normalize_topic  # Import the topic normalizer
 
 # Load environment variables (important: create a .env file)
 from dotenv import load_dotenv
 load_dotenv()
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
 
 # --- Configuration ---
 # Option 1: Use Azure OpenAI
@@ -26,6 +30,12 @@ AZURE_MODEL_NAME = os.getenv("AZURE_OPENAI_MODEL_NAME") # Load the model name (o
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 OPENAI_MODEL = os.getenv("OPENAI_VISION_MODEL", "gpt-4-vision-preview") # Or relevant vision model
 
+# --- Upload Image Settings ---
+# Screenshots are downscaled and re-encoded before upload; the vision models don't use more detail than this
+LLM_IMAGE_MAX_SIZE = 1568
+LLM_IMAGE_FORMAT = "WEBP"
+LLM_IMAGE_QUALITY = 75
+
 # --- LLM Prompt ---
 LLM_PROMPT = """
 based on this image of screenshot
@@ -40,46 +50,59 @@ and make sure the json is valid and well formatted
 """
 
 # --- Client Initialization ---
+# A shared HTTP/2 connection pool kept alive between tracking iterations, so each analysis
+# skips the TCP + TLS handshake. DefaultHttpxClient keeps the SDK's own defaults otherwise.
+http_client = DefaultHttpxClient(
+    http2=True,
+    limits=httpx.Limits(max_keepalive_connections=4, keepalive_expiry=300),
+    timeout=60
+)
 client = None
 if USE_AZURE:
     # Check for all required Azure variables
     if not all([AZURE_ENDPOINT, AZURE_API_KEY, AZURE_DEPLOYMENT_NAME, AZURE_API_VERSION]):
-        logging.error("Azure environment variables (ENDPOINT, API_KEY, DEPLOYMENT_NAME, API_VERSION) not set.")
+        logger.error("Azure environment variables (ENDPOINT, API_KEY, DEPLOYMENT_NAME, API_VERSION) not set.")
         # Potentially raise an error or exit
     else:
         try:
             client = AzureOpenAI(
                 api_key=AZURE_API_KEY,
                 api_version=AZURE_API_VERSION, # Use the specific API version from .env
-                azure_endpoint=AZURE_ENDPOINT
+                azure_endpoint=AZURE_ENDPOINT,
+                http_client=http_client
             )
-            logging.info(f"Using Azure OpenAI client. Endpoint: {AZURE_ENDPOINT}, Deployment: {AZURE_DEPLOYMENT_NAME}, API Version: {AZURE_API_VERSION}")
+            logger.info(f"Using Azure OpenAI client. Endpoint: {AZURE_ENDPOINT}, Deployment: {AZURE_DEPLOYMENT_NAME}, API Version: {AZURE_API_VERSION}")
         except Exception as e:
-            logging.error(f"Failed to initialize Azure OpenAI client: {e}")
+            logger.error(f"Failed to initialize Azure OpenAI client: {e}")
 else:
     if not OPENAI_API_KEY:
-        logging.error("OPENAI_API_KEY environment variable not set.")
+        logger.error("OPENAI_API_KEY environment variable not set.")
         # Potentially raise an error or exit
     else:
         try:
-            client = OpenAI(api_key=OPENAI_API_KEY)
-            logging.info("Using standard OpenAI client.")
+            client = OpenAI(api_key=OPENAI_API_KEY, http_client=http_client)
+            logger.info("Using standard OpenAI client.")
         except Exception as e:
-            logging.error(f"Failed to initialize OpenAI client: {e}")
+            logger.error(f"Failed to initialize OpenAI client: {e}")
 
 # Function to encode the image
 def encode_image_to_base64(image_path):
+    """Downscales the image and returns it as base64-encoded WebP (a fraction of the PNG's size)."""
     try:
-        with open(image_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode('utf-8')
+        with Image.open(image_path) as image:
+            image.thumbnail((LLM_IMAGE_MAX_SIZE, LLM_IMAGE_MAX_SIZE), Image.Resampling.LANCZOS)
+            buffer = io.BytesIO()
+            image.save(buffer, format=LLM_IMAGE_FORMAT, quality=LLM_IMAGE_QUALITY)
+        # getbuffer() hands the encoder the BytesIO memory directly instead of copying it out first
+        return pybase64.b64encode(buffer.getbuffer()).decode('ascii')
     except Exception as e:
-        logging.error(f"Error encoding image {image_path}: {e}")
+        logger.error(f"Error encoding image {image_path}: {e}")
         return None
 
 def analyze_screenshot(image_path):
     """Sends the screenshot to the LLM and returns the analysis."""
     if not client:
-        logging.error("LLM client not initialized. Cannot analyze image.")
+        logger.error("LLM client not initialized. Cannot analyze image.")
         return None
 
     base64_image = encode_image_to_base64(image_path)
@@ -94,7 +117,7 @@ def analyze_screenshot(image_path):
                 {
                     "type": "image_url",
                     "image_url": {
-                        "url": f"data:image/png;base64,{base64_image}"
+                        "url": f"data:image/webp;base64,{base64_image}"
                     }
                 }
             ]
@@ -102,7 +125,7 @@ def analyze_screenshot(image_path):
     ]
 
     try:
-        logging.info(f"Sending request to LLM for image: {os.path.basename(image_path)}")
+        logger.info(f"Sending request to LLM for image: {os.path.basename(image_path)}")
         if USE_AZURE:
             response = client.chat.completions.create(
                 model=AZURE_DEPLOYMENT_NAME, # Use deployment name for Azure
@@ -120,8 +143,8 @@ def analyze_screenshot(image_path):
 
         analysis_content = response.choices[0].message.content
         print(analysis_content)
-        logging.info("Received LLM response.")
-        logging.debug(f"LLM Raw Response: {analysis_content}")
+        logger.info("Received LLM response.")
+        logger.debug(f"LLM Raw Response: {analysis_content}")
 
         # Attempt to parse the JSON response
         try:
@@ -131,7 +154,7 @@ def analyze_screenshot(image_path):
             elif analysis_content.startswith("```"):
                  analysis_content = analysis_content.strip("```").strip()
 
-            analysis_json = json.loads(analysis_content)
+            analysis_json = orjson.loads(analysis_content)
             # Validate expected keys
             if all(k in analysis_json for k in ["crisp_description", "main_topic", "short_description"]):
                  # Normalize the main_topic before returning
@@ -139,25 +162,27 @@ def analyze_screenshot(image_path):
                      analysis_json["main_topic"] = normalize_topic(analysis_json["main_topic"])
                  return analysis_json
             else:
-                logging.warning(f"LLM response JSON missing expected keys: {analysis_content}")
+                logger.warning(f"LLM response JSON missing expected keys: {analysis_content}")
                 # Fallback: return raw content if JSON parsing/validation fails but content exists
                 return {"error": "Invalid JSON structure", "raw_content": analysis_content}
 
-        except json.JSONDecodeError as json_err:
-            logging.error(f"Failed to parse LLM response as JSON: {json_err}")
-            logging.error(f"Raw response content: {analysis_content}")
+        except orjson.JSONDecodeError as json_err:
+            logger.error(f"Failed to parse LLM response as JSON: {json_err}")
+            logger.error(f"Raw response content: {analysis_content}")
             return {"error": "JSONDecodeError", "raw_content": analysis_content} # Return raw content on error
 
     except Exception as e:
-        logging.error(f"Error calling LLM API: {e}")
+        logger.error(f"Error calling LLM API: {e}")
         # Check for specific API errors if needed (e.g., authentication, rate limits)
         # Updated logging to show the deployment name used
         if "invalid_request_error" in str(e) and "does not support image input" in str(e):
-             logging.error(f"Model deployment '{AZURE_DEPLOYMENT_NAME if USE_AZURE else OPENAI_MODEL}' might not support vision or check API version/endpoint.")
+             logger.error(f"Model deployment '{AZURE_DEPLOYMENT_NAME if USE_AZURE else OPENAI_MODEL}' might not support vision or check API version/endpoint.")
         return None
 
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
     # Example usage (requires a sample screenshot)
     # 1. Run screenshot_capture.py first to generate a screenshot
     # 2. Make sure .env is configured with your API keys/endpoint
@@ -1,12 +1,15 @@
 import time
 import logging
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import os
 from dotenv import load_dotenv
 
 from screenshot_capture import take_screenshot
 from image_analysis import analyze_screenshot
-from data_storage import save_activity
+from data_storage import save_activity, flush_pending
 from utils import get_active_window_title
 
 # --- Load Configuration from .env ---
@@ -14,6 +17,8 @@ load_dotenv()
 TRACKING_INTERVAL_SECONDS = int(os.getenv('TRACKING_INTERVAL_SECONDS', 120))
 MAX_RETRIES = int(os.getenv('MAX_RETRIES', 3))
 RETRY_DELAY_SECONDS = int(os.getenv('RETRY_DELAY_SECONDS', 10))
+ANALYSIS_WORKERS = int(os.getenv('ANALYSIS_WORKERS', 4))
+MAX_PENDING_ANALYSES = int(os.getenv('MAX_PENDING_ANALYSES', 8))
 
 # --- Logging Setup ---
 LOG_DIR = "logs"
@@ -29,12 +34,16 @@ logging.basicConfig(
     ]
 )
 
+# --- Analysis Pipeline ---
+# Capture runs on the main loop's schedule; the slow LLM analysis + save runs on worker threads.
+executor = ThreadPoolExecutor(max_workers=ANALYSIS_WORKERS, thread_name_prefix="analysis")
+pending_analyses = threading.BoundedSemaphore(MAX_PENDING_ANALYSES) # Caps queued + running analyses
+
 def run_tracker_iteration():
-    """Performs one iteration of the tracking loop."""
+    """Performs one iteration of the tracking loop: capture now, analyze in the background."""
     logging.info("--- Starting tracking iteration ---")
     timestamp = datetime.now()
     screenshot_path = None
-    analysis_result = None
     active_window = "Unknown"
 
     # 1. Get Active Window Title
@@ -68,7 +77,28 @@ def run_tracker_iteration():
         # save_activity(timestamp, active_window, "Screenshot Failed", "Error", "Could not capture screen", None)
         return # End iteration if screenshot failed
 
-    # 3. Analyze Screenshot (with retries)
+    # 3. Hand off analysis + save to the worker pool
+    if not pending_analyses.acquire(blocking=False):
+        logging.warning(f"{MAX_PENDING_ANALYSES} analyses already pending. Skipping analysis for {screenshot_path}.")
+        save_activity(timestamp, active_window, "Analysis Skipped", "Error", "Analysis backlog full", screenshot_path)
+        return
+    future = executor.submit(analyze_and_save, timestamp, active_window, screenshot_path)
+    future.add_done_callback(_on_analysis_done)
+    logging.info("--- Finished tracking iteration (analysis queued) ---")
+
+
+def _on_analysis_done(future):
+    """Frees the pending slot and surfaces any exception raised on the worker thread."""
+    pending_analyses.release()
+    if not future.cancelled() and future.exception():
+        logging.error(f"Unhandled exception in analysis worker: {future.exception()}", exc_info=future.exception())
+
+
+def analyze_and_save(timestamp, active_window, screenshot_path):
+    """Analyzes a captured screenshot and saves the result. Runs on a worker thread."""
+    analysis_result = None
+
+    # 1. Analyze Screenshot (with retries)
     for attempt in range(MAX_RETRIES):
         try:
             analysis_result = analyze_screenshot(screenshot_path)
@@ -100,7 +130,7 @@ def run_tracker_iteration():
                 save_activity(timestamp, active_window, "Analysis Failed", "Error", f"Exception during analysis: {e}", screenshot_path)
                 analysis_result = None # Ensure we don't proceed
 
-    # 4. Save Data
+    # 2. Save Data
     if analysis_result and "error" not in analysis_result:
         try:
             save_activity(
@@ -118,14 +148,20 @@ def run_tracker_iteration():
          logging.warning("No valid analysis result obtained, skipping save for this iteration (error should have been logged/saved previously).")
     # else: analysis_result had an error, which was already saved by the retry logic
 
-    # 5. Optional: Clean up old screenshots (implement if needed)
+    # 3. Optional: Clean up old screenshots (implement if needed)
     # cleanup_old_screenshots(SCREENSHOT_DIR, keep_days=7)
 
-    logging.info("--- Finished tracking iteration ---")
+    logging.info(f"--- Finished analysis for {os.path.basename(screenshot_path)} ---")
+
+
+def _handle_sigterm(signum, frame):
+    """Turns SIGTERM into the same clean shutdown path as Ctrl+C."""
+    raise KeyboardInterrupt
 
 
 def main():
     """Main loop for the activity tracker."""
+    signal.signal(signal.SIGTERM, _handle_sigterm)
     logging.info("Starting AI Task Tracker...")
     logging.info(f"Tracking interval set to {TRACKING_INTERVAL_SECONDS} seconds.")
     logging.info("Ensure your .env file is configured with API keys/endpoints.")
@@ -144,6 +180,11 @@ def main():
             logging.info("Attempting to continue after 60 seconds...")
             time.sleep(60)
 
+    # Let in-flight analyses finish so their results are saved; drop the ones not yet started
+    logging.info("Waiting for running analyses to finish...")
+    executor.shutdown(wait=True, cancel_futures=True)
+    flush_pending() # Write out rows still buffered in data_storage
+
 
 if __name__ == "__main__":
     main()
@@ -1,25 +1,83 @@
 import os
+import asyncio
+import hashlib
+import json
 import logging
-from openai import AzureOpenAI, OpenAI
+import sqlite3
+import threading
+import time
+import httpx
+import numpy as np
+import openai
+from openai import AzureOpenAI, OpenAI, AsyncAzureOpenAI, AsyncOpenAI
+from cachetools import TTLCache
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_random_exponential
+from concurrent.futures import Future
 from functools import lru_cache
-from dotenv import load_dotenv
+from types import SimpleNamespace
+from dotenv import dotenv_values
 
-# Load environment variables
-load_dotenv()
-
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
 
 # --- Configuration ---
 # Use the same client configuration as in image_analysis.py
-USE_AZURE = os.getenv("USE_AZURE", "False").lower() == "true"
-AZURE_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
-AZURE_API_KEY = os.getenv("AZURE_OPENAI_API_KEY")
-AZURE_DEPLOYMENT_NAME = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME") 
-AZURE_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION")
+@lru_cache(maxsize=1)
+def _cfg():
+    """Reads .env once (process environment wins, as with load_dotenv) into a config namespace."""
+    vals = {**dotenv_values(), **os.environ}
+    return SimpleNamespace(
+        USE_AZURE=vals.get("USE_AZURE", "False").lower() == "true",
+        AZURE_ENDPOINT=vals.get("AZURE_OPENAI_ENDPOINT"),
+        AZURE_API_KEY=vals.get("AZURE_OPENAI_API_KEY"),
+        AZURE_DEPLOYMENT_NAME=vals.get("AZURE_OPENAI_DEPLOYMENT_NAME"),
+        AZURE_API_VERSION=vals.get("AZURE_OPENAI_API_VERSION"),
+        # Standard OpenAI API
+        OPENAI_API_KEY=vals.get("OPENAI_API_KEY"),
+        OPENAI_MODEL=vals.get("OPENAI_MODEL", "gpt-3.5-turbo"), # Text model (not vision)
+        # Max in-flight requests when normalizing a batch of topics concurrently
+        OPENAI_CONCURRENCY=int(vals.get("OPENAI_CONCURRENCY", 20)),
+        # Persistent cache of normalized topics, so restarts don't re-pay for topics seen before
+        TOPIC_CACHE_FILE=vals.get("TOPIC_CACHE_FILE", "data/topic_cache.sqlite"),
+        # Stored labels older than this are ignored and re-normalized, so bad ones age out
+        TOPIC_CACHE_TTL_SECONDS=int(vals.get("TOPIC_CACHE_TTL_SECONDS", 30 * 86400)),
+        # Semantic cache: a new topic whose embedding is close enough to an already-normalized one
+        # reuses that label instead of a chat completion. Azure needs its own embedding deployment;
+        # without one the semantic cache is off.
+        AZURE_EMBEDDING_DEPLOYMENT_NAME=vals.get("AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME"),
+        OPENAI_EMBEDDING_MODEL=vals.get("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small"),
+        SEMANTIC_CACHE_THRESHOLD=float(vals.get("SEMANTIC_CACHE_THRESHOLD", 0.92)), # Min cosine similarity for a hit
+        # Batch API (offline bulk normalization at half price; results arrive within 24h)
+        BATCH_POLL_SECONDS=int(vals.get("BATCH_POLL_SECONDS", 60)),
+    )
+
+CFG = _cfg()
+
+# Both SDK clients take the Azure deployment name as `model`, so resolve the choice once here
+MODEL_ARG = CFG.AZURE_DEPLOYMENT_NAME if CFG.USE_AZURE else CFG.OPENAI_MODEL
+EMBEDDING_MODEL = CFG.AZURE_EMBEDDING_DEPLOYMENT_NAME if CFG.USE_AZURE else CFG.OPENAI_EMBEDDING_MODEL
+
+# In-process cache in front of the persistent one; its TTL bounds how long a label outlives its
+# on-disk entry (CFG.TOPIC_CACHE_TTL_SECONDS), which is what ages bad labels out
+L1_CACHE_SIZE = 10000
+L1_CACHE_TTL_SECONDS = 86400
 
-# Standard OpenAI API
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo") # Text model (not vision)
+BATCH_ENDPOINT_URL = "/chat/completions" if CFG.USE_AZURE else "/v1/chat/completions"
+
+# Completion budget per normalized label: labels run ~3-6 tokens, and stopping at the first
+# newline cuts off any commentary a model appends after the label
+NORMALIZE_MAX_TOKENS = 16
+NORMALIZE_STOP = ["\n"]
+
+# Tight per-phase timeouts so a stalled request fails fast and gets retried (see _api_retry).
+# The SDK's built-in retries are off so tenacity is the only retry layer.
+API_TIMEOUT = httpx.Timeout(connect=5.0, read=10.0, write=5.0, pool=5.0)
+API_MAX_ATTEMPTS = 4
+BATCH_API_TIMEOUT_SECONDS = 600 # Batch API file transfers (normalize_topics_batch)
+
+# Topics packed into one chat completion by normalize_topics_multi
+MULTI_TOPIC_CHUNK_SIZE = 20
+# JSON mode needs a 2023-12-01-preview or newer API version on Azure
+JSON_RESPONSE_FORMAT = {"type": "json_object"} if not CFG.USE_AZURE or (CFG.AZURE_API_VERSION or "") >= "2023-12-01-preview" else None
 
 # --- LLM Prompt ---
 NORMALIZE_PROMPT = """
@@ -34,78 +92,582 @@ And make sure the topics are related to apps which are running as main in screen
 Topic to normalize: {topic}
 """
 
+MULTI_NORMALIZE_PROMPT = """
+You are a topic normalizer. Your task is to normalize each of the given topics to a consistent format.
+For example:
+- "working with vs code" and "coding on vs code" should both be normalized to "Visual Studio Code"
+- "python programming" and "coding in python" should both be normalized to "Python Programming"
+
+Return a JSON object of the form {"topics": ["...", "..."]} containing exactly one normalized topic
+per input topic, in the same order, without any additional explanations.
+And make sure the topics are related to apps which are running as main in screen
+
+Topics to normalize:
+{topics}
+"""
+
+# The templates are split once here so each call only concatenates the topic(s) in,
+# instead of running str.format; the system messages never change.
+PROMPT_PREFIX, PROMPT_SUFFIX = NORMALIZE_PROMPT.split("{topic}")
+MULTI_PROMPT_PREFIX, MULTI_PROMPT_SUFFIX = MULTI_NORMALIZE_PROMPT.split("{topics}")
+SYSTEM_MSG = {"role": "system", "content": "You are a topic normalizer assistant. Respond only with the normalized topic."}
+MULTI_SYSTEM_MSG = {"role": "system", "content": "You are a topic normalizer assistant. Respond only with the JSON object."}
+
 # --- Client Initialization ---
 client = None
-if USE_AZURE:
-    if not all([AZURE_ENDPOINT, AZURE_API_KEY, AZURE_DEPLOYMENT_NAME, AZURE_API_VERSION]):
-        logging.error("Azure environment variables not set for topic normalizer.")
+if CFG.USE_AZURE:
+    if not all([CFG.AZURE_ENDPOINT, CFG.AZURE_API_KEY, CFG.AZURE_DEPLOYMENT_NAME, CFG.AZURE_API_VERSION]):
+        logger.error("Azure environment variables not set for topic normalizer.")
     else:
         try:
             client = AzureOpenAI(
-                api_key=AZURE_API_KEY,
-                api_version=AZURE_API_VERSION,
-                azure_endpoint=AZURE_ENDPOINT
+                api_key=CFG.AZURE_API_KEY,
+                api_version=CFG.AZURE_API_VERSION,
+                azure_endpoint=CFG.AZURE_ENDPOINT,
+                timeout=API_TIMEOUT,
+                max_retries=0
             )
-            logging.info("Topic normalizer using Azure OpenAI client.")
+            logger.info("Topic normalizer using Azure OpenAI client.")
         except Exception as e:
-            logging.error(f"Failed to initialize Azure OpenAI client for topic normalizer: {e}")
+            logger.error(f"Failed to initialize Azure OpenAI client for topic normalizer: {e}")
 else:
-    if not OPENAI_API_KEY:
-        logging.error("OPENAI_API_KEY environment variable not set for topic normalizer.")
+    if not CFG.OPENAI_API_KEY:
+        logger.error("OPENAI_API_KEY environment variable not set for topic normalizer.")
     else:
         try:
-            client = OpenAI(api_key=OPENAI_API_KEY)
-            logging.info("Topic normalizer using standard OpenAI client.")
+            client = OpenAI(api_key=CFG.OPENAI_API_KEY, timeout=API_TIMEOUT, max_retries=0)
+            logger.info("Topic normalizer using standard OpenAI client.")
         except Exception as e:
-            logging.error(f"Failed to initialize OpenAI client for topic normalizer: {e}")
+            logger.error(f"Failed to initialize OpenAI client for topic normalizer: {e}")
+
+class _ClientNotConfiguredError(RuntimeError):
+    pass
+
+class _NullClient:
+    """Stand-in for an unconfigured client: API calls fail (and normalize falls back to the raw topic)."""
+    def __bool__(self):
+        return False # Lets the bulk helpers still skip their setup with one `if not client` check
+
+    def __getattr__(self, name):
+        raise _ClientNotConfiguredError("OpenAI client not configured; check env vars")
+
+if not client:
+    client = _NullClient()
+    EMBEDDING_MODEL = None # No semantic cache lookups without a client to embed with
+
+# --- Topic Caches ---
+# L1: TTL cache keyed on the canonical topic, plus the requests currently running for each key
+# so concurrent callers of the same topic share one API call instead of all missing the cache.
+_l1_lock = threading.Lock()
+_l1_cache = TTLCache(maxsize=L1_CACHE_SIZE, ttl=L1_CACHE_TTL_SECONDS)
+_in_flight = {}        # canonical topic -> concurrent.futures.Future (sync callers, across threads)
+_in_flight_async = {}  # canonical topic -> asyncio.Future (async callers on one event loop)
+
+# L2: SQLite on disk
+_cache_lock = threading.Lock() # normalize_topic runs on the tracker's analysis worker threads
+_cache_conn = None
+_semantic_vectors = None # Unit-length embeddings of normalized topics, one row per entry
+_semantic_labels = []    # Normalized topic for each row of _semantic_vectors
+_semantic_created = np.empty(0) # created_at of each row, so rows expire like the topics table
+_semantic_rows = {}      # cache key -> row index, so re-normalizing a topic replaces its row
+
+def canonical_topic(topic):
+    """Lowercases and collapses whitespace so trivially different spellings share a cache entry."""
+    return " ".join(topic.lower().split())
+
+def _dedupe_key(topic):
+    """Groups the topics of a bulk call that share one request; invalid topics are kept as-is."""
+    return canonical_topic(topic) if topic and isinstance(topic, str) else topic
+
+def _cache_key(topic):
+    return hashlib.blake2b(canonical_topic(topic).encode("utf-8"), digest_size=16).hexdigest()
+
+def _cache_cutoff():
+    """Oldest created_at still served from the on-disk cache."""
+    return time.time() - CFG.TOPIC_CACHE_TTL_SECONDS
+
+def _get_cache_conn():
+    """Opens (and creates, if needed) the SQLite cache on first use. Caller must hold _cache_lock."""
+    global _cache_conn
+    if _cache_conn is None:
+        if not client and not os.path.exists(CFG.TOPIC_CACHE_FILE):
+            # Nothing gets normalized (or cached) without a client, so don't create an empty cache file
+            _cache_conn = sqlite3.connect(":memory:", check_same_thread=False)
+        else:
+            cache_dir = os.path.dirname(CFG.TOPIC_CACHE_FILE)
+            if cache_dir and not os.path.exists(cache_dir):
+                os.makedirs(cache_dir)
+            _cache_conn = sqlite3.connect(CFG.TOPIC_CACHE_FILE, check_same_thread=False)
+        _cache_conn.execute("CREATE TABLE IF NOT EXISTS topics (key TEXT PRIMARY KEY, normalized TEXT NOT NULL, created_at REAL NOT NULL DEFAULT 0)")
+        _cache_conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, normalized TEXT NOT NULL, vector BLOB NOT NULL, created_at REAL NOT NULL DEFAULT 0)")
+        for table in ("topics", "embeddings"):
+            # Caches written before entries expired: their rows get created_at 0, i.e. already stale
+            if "created_at" not in {column[1] for column in _cache_conn.execute(f"PRAGMA table_info({table})")}:
+                _cache_conn.execute(f"ALTER TABLE {table} ADD COLUMN created_at REAL NOT NULL DEFAULT 0")
+    return _cache_conn
+
+def get_cached_topic(topic):
+    """Returns the stored normalization for `topic` (L1, then disk), or None on a miss."""
+    key = canonical_topic(topic)
+    with _l1_lock:
+        normalized_topic = _l1_cache.get(key)
+    if normalized_topic is not None:
+        return normalized_topic
+
+    try:
+        with _cache_lock:
+            row = _get_cache_conn().execute("SELECT normalized FROM topics WHERE key = ? AND created_at >= ?",
+                                            (_cache_key(topic), _cache_cutoff())).fetchone()
+    except Exception as e:
+        logger.error(f"Error reading topic cache {CFG.TOPIC_CACHE_FILE}: {e}")
+        return None  # The cache is best-effort; fall through to the API
+    if row:
+        with _l1_lock:
+            _l1_cache[key] = row[0]
+        return row[0]
+    return None
+
+def _set_l1_topic(topic, normalized_topic):
+    """Stores a label in the in-process cache only.
+
+    Used for semantic cache hits: writing them to disk would stamp the borrowed label as
+    new, and it would never age out.
+    """
+    with _l1_lock:
+        _l1_cache[canonical_topic(topic)] = normalized_topic
+
+def set_cached_topic(topic, normalized_topic):
+    """Stores a successful normalization for `topic` in both cache tiers."""
+    with _l1_lock:
+        _l1_cache[canonical_topic(topic)] = normalized_topic
+    try:
+        with _cache_lock:
+            conn = _get_cache_conn()
+            conn.execute("INSERT OR REPLACE INTO topics (key, normalized, created_at) VALUES (?, ?, ?)",
+                         (_cache_key(topic), normalized_topic, time.time()))
+            conn.commit()
+    except Exception as e:
+        logger.error(f"Error writing topic cache {CFG.TOPIC_CACHE_FILE}: {e}")
+
+def _load_semantic_index():
+    """Loads stored embeddings into memory on first use. Caller must hold _cache_lock."""
+    global _semantic_vectors, _semantic_created
+    if _semantic_vectors is None:
+        rows = _get_cache_conn().execute("SELECT key, normalized, vector, created_at FROM embeddings WHERE created_at >= ?",
+                                         (_cache_cutoff(),)).fetchall()
+        _semantic_rows.update((key, i) for i, (key, _, _, _) in enumerate(rows))
+        _semantic_labels.extend(normalized for _, normalized, _, _ in rows)
+        _semantic_created = np.array([created_at for _, _, _, created_at in rows], dtype=np.float64)
+        vectors = [np.frombuffer(vector, dtype=np.float32) for _, _, vector, _ in rows]
+        _semantic_vectors = np.vstack(vectors) if vectors else None
+
+def _unit_vector(embedding_response):
+    vector = np.asarray(embedding_response.data[0].embedding, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+def find_similar_topic(vector, topic=None):
+    """Returns the normalized label of the closest stored topic if it clears CFG.SEMANTIC_CACHE_THRESHOLD, else None.
+
+    Expired rows never match, and neither does `topic`'s own row: its label is re-normalized
+    once it expires rather than matched back to itself.
+    """
+    try:
+        with _cache_lock:
+            _load_semantic_index()
+            if _semantic_vectors is None or _semantic_vectors.shape[1] != vector.shape[0]:
+                return None
+            similarities = _semantic_vectors @ vector # Cosine similarity, since all vectors are unit length
+            similarities[_semantic_created < _cache_cutoff()] = -np.inf
+            own_row = _semantic_rows.get(_cache_key(topic)) if topic else None
+            if own_row is not None:
+                similarities[own_row] = -np.inf
+            best = int(np.argmax(similarities))
+            if similarities[best] >= CFG.SEMANTIC_CACHE_THRESHOLD:
+                return _semantic_labels[best]
+        return None
+    except Exception as e:
+        logger.error(f"Error searching semantic topic cache: {e}")
+        return None
+
+def add_similar_topic(topic, vector, normalized_topic):
+    """Adds a topic's embedding and its normalized label to the semantic cache."""
+    global _semantic_vectors, _semantic_created
+    key = _cache_key(topic)
+    created_at = time.time()
+    try:
+        with _cache_lock:
+            _load_semantic_index()
+            conn = _get_cache_conn()
+            conn.execute("INSERT OR REPLACE INTO embeddings (key, normalized, vector, created_at) VALUES (?, ?, ?, ?)",
+                         (key, normalized_topic, vector.astype(np.float32).tobytes(), created_at))
+            conn.commit()
+            row = _semantic_rows.get(key)
+            if row is not None:
+                # Mirror the REPLACE, so a re-normalized topic doesn't leave its stale row behind
+                _semantic_vectors[row] = vector
+                _semantic_labels[row] = normalized_topic
+                _semantic_created[row] = created_at
+            else:
+                _semantic_rows[key] = len(_semantic_labels)
+                _semantic_vectors = vector[np.newaxis, :] if _semantic_vectors is None else np.vstack([_semantic_vectors, vector])
+                _semantic_labels.append(normalized_topic)
+                _semantic_created = np.append(_semantic_created, created_at)
+    except Exception as e:
+        logger.error(f"Error writing semantic topic cache: {e}")
+
+# --- API Calls ---
+# Retries transient failures (dropped connections, timeouts, 429s) with jittered exponential
+# backoff; anything else, or the last failed attempt, is raised to the caller
+_api_retry = retry(
+    wait=wait_random_exponential(min=0.5, max=8),
+    stop=stop_after_attempt(API_MAX_ATTEMPTS),
+    retry=retry_if_exception_type((openai.APIConnectionError, openai.RateLimitError, openai.APITimeoutError)),
+    reraise=True
+)
+
+@_api_retry
+def _create_completion(**kwargs):
+    return client.chat.completions.create(**kwargs)
+
+@_api_retry
+async def _create_completion_async(async_client, **kwargs):
+    return await async_client.chat.completions.create(**kwargs)
+
+# --- Topic Normalization ---
+def _build_messages(topic):
+    """Builds the chat messages asking the LLM to normalize one topic."""
+    return [SYSTEM_MSG, {"role": "user", "content": PROMPT_PREFIX + topic + PROMPT_SUFFIX}]
 
-@lru_cache(maxsize=100)  # Cache results to avoid repeated API calls for same topics
 def normalize_topic(topic):
     """Normalizes a topic using LLM to ensure consistency."""
-    if not client:
-        logging.error("LLM client not initialized. Cannot normalize topic.")
-        return topic  # Return original topic if client is not available
-    
     if not topic or not isinstance(topic, str):
         return "Unknown"
+
+    # Single-flight: if another thread is already normalizing this topic, wait for its result
+    key = canonical_topic(topic)
+    with _l1_lock:
+        future = _in_flight.get(key)
+        is_owner = future is None
+        if is_owner:
+            future = _in_flight[key] = Future()
+    if not is_owner:
+        return future.result()
+
+    try:
+        normalized_topic = _normalize_topic_once(topic)
+        future.set_result(normalized_topic)
+        return normalized_topic
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _l1_lock:
+            del _in_flight[key]
+
+def _normalize_topic_once(topic):
+    """Cache lookups, then the API call, for a single topic. Use normalize_topic instead."""
+    cached_topic = get_cached_topic(topic)
+    if cached_topic is not None:
+        return cached_topic
+
+    vector = None
+    if EMBEDDING_MODEL:
+        try:
+            vector = _unit_vector(client.embeddings.create(model=EMBEDDING_MODEL, input=topic))
+            similar_topic = find_similar_topic(vector, topic)
+            if similar_topic is not None:
+                logger.info("Semantic cache hit: %r -> %r", topic, similar_topic)
+                _set_l1_topic(topic, similar_topic)
+                return similar_topic
+        except Exception as e:
+            logger.error(f"Error embedding topic for semantic cache: {e}")
     
     try:
-        logging.info(f"Normalizing topic: '{topic}'")
-        messages = [
-            {
-                "role": "system",
-                "content": "You are a topic normalizer assistant. Respond only with the normalized topic."
-            },
-            {
-                "role": "user",
-                "content": NORMALIZE_PROMPT.format(topic=topic)
-            }
-        ]
+        logger.info("Normalizing topic: %r", topic)
+        messages = _build_messages(topic)
         
-        if USE_AZURE:
-            response = client.chat.completions.create(
-                model=AZURE_DEPLOYMENT_NAME,
-                messages=messages,
-                max_tokens=50,
-                temperature=0.1  # Low temperature for consistent results
-            )
-        else:
-            response = client.chat.completions.create(
-                model=OPENAI_MODEL,
-                messages=messages,
-                max_tokens=50,
-                temperature=0.1
-            )
+        response = _create_completion(
+            model=MODEL_ARG,
+            messages=messages,
+            max_tokens=NORMALIZE_MAX_TOKENS,
+            stop=NORMALIZE_STOP,
+            temperature=0.1  # Low temperature for consistent results
+        )
             
-        normalized_topic = response.choices[0].message.content.strip()
-        logging.info(f"Normalized '{topic}' to '{normalized_topic}'")
+        normalized_topic = (response.choices[0].message.content or "").strip()
+        if not normalized_topic:
+            # e.g. a reply starting with the "\n" stop sequence; don't cache it as the label
+            raise ValueError("empty completion")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Normalized %r to %r", topic, normalized_topic)
+        set_cached_topic(topic, normalized_topic)
+        if vector is not None:
+            add_similar_topic(topic, vector, normalized_topic)
         return normalized_topic
         
+    except _ClientNotConfiguredError:
+        logger.error("LLM client not initialized. Cannot normalize topic.")
+        return topic  # Return original topic if client is not available
     except Exception as e:
-        logging.error(f"Error normalizing topic: {e}")
+        logger.error(f"Error normalizing topic: {e}")
         return topic  # Return original topic on error
+
+# --- Async Batch Normalization ---
+def _create_async_client():
+    """Creates an async client with the same configuration as `client`.
+
+    A new one is made per batch: the async HTTP connection pool is tied to the event loop
+    that first uses it, and each asyncio.run() call starts a new loop.
+    """
+    if CFG.USE_AZURE:
+        return AsyncAzureOpenAI(
+            api_key=CFG.AZURE_API_KEY,
+            api_version=CFG.AZURE_API_VERSION,
+            azure_endpoint=CFG.AZURE_ENDPOINT,
+            timeout=API_TIMEOUT,
+            max_retries=0
+        )
+    return AsyncOpenAI(api_key=CFG.OPENAI_API_KEY, timeout=API_TIMEOUT, max_retries=0)
+
+async def normalize_topic_async(topic, async_client, semaphore):
+    """Async version of normalize_topic; `semaphore` bounds concurrent requests."""
+    if not topic or not isinstance(topic, str):
+        return "Unknown"
+
+    # Single-flight: coroutines on this loop asking for the same topic await the first one's request
+    key = canonical_topic(topic)
+    loop = asyncio.get_running_loop()
+    with _l1_lock:
+        future = _in_flight_async.get(key)
+        is_owner = future is None or future.get_loop() is not loop
+        if is_owner:
+            future = _in_flight_async[key] = loop.create_future()
+    if not is_owner:
+        return await asyncio.shield(future)
+
+    try:
+        normalized_topic = await _normalize_topic_once_async(topic, async_client, semaphore)
+        future.set_result(normalized_topic)
+        return normalized_topic
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    finally:
+        if not future.done():
+            future.cancel()  # Cancelled while waiting; release the coroutines sharing this request
+        with _l1_lock:
+            if _in_flight_async.get(key) is future:
+                del _in_flight_async[key]
+
+async def _normalize_topic_once_async(topic, async_client, semaphore):
+    """Cache lookups, then the API call, for a single topic. Use normalize_topic_async instead."""
+    cached_topic = get_cached_topic(topic)
+    if cached_topic is not None:
+        return cached_topic
+
+    vector = None
+    if EMBEDDING_MODEL:
+        try:
+            async with semaphore:
+                embedding_response = await async_client.embeddings.create(model=EMBEDDING_MODEL, input=topic)
+            vector = _unit_vector(embedding_response)
+            similar_topic = find_similar_topic(vector, topic)
+            if similar_topic is not None:
+                logger.info("Semantic cache hit: %r -> %r", topic, similar_topic)
+                _set_l1_topic(topic, similar_topic)
+                return similar_topic
+        except Exception as e:
+            logger.error(f"Error embedding topic for semantic cache: {e}")
+
+    try:
+        async with semaphore:
+            logger.info("Normalizing topic: %r", topic)
+            response = await _create_completion_async(
+                async_client,
+                model=MODEL_ARG,
+                messages=_build_messages(topic),
+                max_tokens=NORMALIZE_MAX_TOKENS,
+                stop=NORMALIZE_STOP,
+                temperature=0.1  # Low temperature for consistent results
+            )
+        normalized_topic = (response.choices[0].message.content or "").strip()
+        if not normalized_topic:
+            # e.g. a reply starting with the "\n" stop sequence; don't cache it as the label
+            raise ValueError("empty completion")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Normalized %r to %r", topic, normalized_topic)
+        set_cached_topic(topic, normalized_topic)
+        if vector is not None:
+            add_similar_topic(topic, vector, normalized_topic)
+        return normalized_topic
+
+    except Exception as e:
+        logger.error(f"Error normalizing topic: {e}")
+        return topic  # Return original topic on error
+
+async def normalize_topics(topics):
+    """Normalizes a list of topics concurrently (at most CFG.OPENAI_CONCURRENCY in flight), preserving order.
+
+    Topics differing only in case or whitespace are normalized once and share the result.
+    """
+    if not client:
+        logger.error("LLM client not initialized. Cannot normalize topics.")
+        # Return original topics if client is not available ("Unknown" for invalid ones, as normalize_topic does)
+        return [topic if topic and isinstance(topic, str) else "Unknown" for topic in topics]
+
+    # One request per distinct canonical topic; repeats of it share the result
+    unique_topics = {}
+    for topic in topics:
+        unique_topics.setdefault(_dedupe_key(topic), topic)
+
+    semaphore = asyncio.Semaphore(CFG.OPENAI_CONCURRENCY)
+    async with _create_async_client() as async_client:
+        normalized_topics = await asyncio.gather(*(normalize_topic_async(topic, async_client, semaphore) for topic in unique_topics.values()))
+    results = dict(zip(unique_topics, normalized_topics))
+    return [results[_dedupe_key(topic)] for topic in topics]
         
+# --- Multi-Topic Prompt Normalization ---
+async def _normalize_chunk(chunk, async_client, semaphore):
+    """Normalizes up to MULTI_TOPIC_CHUNK_SIZE topics with a single chat completion."""
+    numbered_topics = "\n".join(f"{i}. {topic}" for i, topic in enumerate(chunk, 1))
+    messages = [MULTI_SYSTEM_MSG, {"role": "user", "content": MULTI_PROMPT_PREFIX + numbered_topics + MULTI_PROMPT_SUFFIX}]
+    try:
+        async with semaphore:
+            response = await _create_completion_async(
+                async_client,
+                model=MODEL_ARG,
+                messages=messages,
+                max_tokens=NORMALIZE_MAX_TOKENS * len(chunk),
+                temperature=0.1,
+                response_format=JSON_RESPONSE_FORMAT
+            )
+        normalized_topics = json.loads(response.choices[0].message.content)["topics"]
+        if len(normalized_topics) != len(chunk) or not all(isinstance(t, str) and t.strip() for t in normalized_topics):
+            raise ValueError(f"expected {len(chunk)} non-empty topics, got {normalized_topics!r}")
+    except Exception as e:
+        logger.warning(f"Multi-topic normalization failed ({e}). Falling back to one request per topic.")
+        return await asyncio.gather(*(normalize_topic_async(topic, async_client, semaphore) for topic in chunk))
+
+    normalized_topics = [t.strip() for t in normalized_topics]
+    for topic, normalized_topic in zip(chunk, normalized_topics):
+        set_cached_topic(topic, normalized_topic)
+    return normalized_topics
+
+async def normalize_topics_multi(topics):
+    """Normalizes topics MULTI_TOPIC_CHUNK_SIZE at a time per chat completion, preserving order.
+
+    The chunks are sent concurrently. Cached topics are not resent, topics differing only in
+    case or whitespace are sent once, and a chunk whose reply can't be parsed falls back to
+    one request per topic.
+    """
+    results = {}  # dedupe key -> normalized topic
+    uncached = {}  # dedupe key -> first topic seen with that key
+    for topic in topics:
+        key = _dedupe_key(topic)
+        if key in results or key in uncached:
+            continue
+        if not topic or not isinstance(topic, str):
+            results[key] = "Unknown"
+            continue
+        cached_topic = get_cached_topic(topic)
+        if cached_topic is not None:
+            results[key] = cached_topic
+        else:
+            uncached[key] = topic
+
+    if uncached and not client:
+        logger.error("LLM client not initialized. Cannot normalize topics.")
+    elif uncached:
+        pending = list(uncached.values())
+        chunks = [pending[i:i + MULTI_TOPIC_CHUNK_SIZE] for i in range(0, len(pending), MULTI_TOPIC_CHUNK_SIZE)]
+        semaphore = asyncio.Semaphore(CFG.OPENAI_CONCURRENCY)
+        async with _create_async_client() as async_client:
+            chunk_results = await asyncio.gather(*(_normalize_chunk(chunk, async_client, semaphore) for chunk in chunks))
+        for chunk, normalized_topics in zip(chunks, chunk_results):
+            results.update(zip(map(_dedupe_key, chunk), normalized_topics))
+
+    # Topics left unresolved (no client) map to themselves
+    return [results.get(_dedupe_key(topic), topic) for topic in topics]
+
+# --- Batch API Normalization ---
+def _batch_request_line(custom_id, topic):
+    """One JSONL line of a Batch API input file."""
+    return json.dumps({
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": BATCH_ENDPOINT_URL,
+        "body": {
+            "model": MODEL_ARG,
+            "messages": _build_messages(topic),
+            "max_tokens": NORMALIZE_MAX_TOKENS,
+            "stop": NORMALIZE_STOP,
+            "temperature": 0.1
+        }
+    })
+
+def normalize_topics_batch(topics, poll_interval=CFG.BATCH_POLL_SECONDS):
+    """Normalizes topics through the Batch API and returns a {topic: normalized_topic} dict.
+
+    Meant for offline backlogs, not interactive use: this blocks until the batch finishes,
+    which can take up to 24 hours. Cached topics are not resubmitted, and any topic the
+    batch fails to normalize maps to itself.
+    """
+    results = {topic: "Unknown" for topic in topics if not topic or not isinstance(topic, str)}
+    pending = {}  # custom_id -> topic, one request per distinct canonical topic
+    for topic in topics:
+        if topic in results:
+            continue
+        cached_topic = get_cached_topic(topic)
+        if cached_topic is not None:
+            results[topic] = cached_topic
+        else:
+            pending.setdefault(_cache_key(topic), topic)
+    batch_results = {}  # custom_id -> normalized topic, for the requests the batch completed
+
+    if pending and not client:
+        logger.error("LLM client not initialized. Cannot normalize topics.")
+    elif pending:
+        try:
+            # File transfers can outlast API_TIMEOUT and aren't wrapped in _api_retry, so let the SDK retry them
+            batch_client = client.with_options(timeout=BATCH_API_TIMEOUT_SECONDS, max_retries=2)
+            input_jsonl = "\n".join(_batch_request_line(custom_id, topic) for custom_id, topic in pending.items())
+            input_file = batch_client.files.create(file=("topics_batch.jsonl", input_jsonl.encode("utf-8")), purpose="batch")
+            batch = batch_client.batches.create(input_file_id=input_file.id, endpoint=BATCH_ENDPOINT_URL, completion_window="24h")
+            logger.info(f"Submitted batch {batch.id} with {len(pending)} topics")
+
+            while batch.status not in ("completed", "failed", "expired", "cancelled"):
+                time.sleep(poll_interval)
+                batch = batch_client.batches.retrieve(batch.id)
+
+            if batch.status != "completed" or not batch.output_file_id:
+                logger.error(f"Batch {batch.id} ended with status '{batch.status}'")
+            else:
+                for line in batch_client.files.content(batch.output_file_id).text.splitlines():
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    custom_id = record.get("custom_id")
+                    response = record.get("response") or {}
+                    if custom_id not in pending or response.get("status_code") != 200:
+                        continue
+                    normalized_topic = (response["body"]["choices"][0]["message"]["content"] or "").strip()
+                    if not normalized_topic:
+                        continue  # Empty reply: leave the topic unnormalized rather than cache ""
+                    set_cached_topic(pending[custom_id], normalized_topic)
+                    batch_results[custom_id] = normalized_topic
+                logger.info(f"Batch {batch.id} normalized {len(batch_results)} of {len(pending)} submitted topics")
+        except Exception as e:
+            logger.error(f"Error normalizing topics via Batch API: {e}")
+
+    # Same-canonical duplicates share the batch's result; topics it didn't normalize map to themselves
+    for topic in topics:
+        if topic not in results:
+            results[topic] = batch_results.get(_cache_key(topic), topic)
+    return results
+
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
     # Test the topic normalizer
     test_topics = [
         "working with vs code", 
@@ -116,6 +678,6 @@ if __name__ == '__main__':
         "setting up azure api"
     ]
     
-    for topic in test_topics:
-        normalized = normalize_topic(topic)
+    normalized_topics = asyncio.run(normalize_topics(test_topics))
+    for topic, normalized in zip(test_topics, normalized_topics):
         print(f"Original: '{topic}' → Normalized: '{normalized}'")
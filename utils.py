@@ -1,26 +1,108 @@
-import pygetwindow as gw
 import platform
 import logging
+import time
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+_PLATFORM = platform.system() # Evaluated once; platform.system() can shell out to uname on some systems
+
+# --- Native Active-Window Lookups ---
+# Each returns the active window's title (the frontmost app's name on macOS), or None if there is none.
+if _PLATFORM == "Windows":
+    import ctypes
+    from ctypes import wintypes
+
+    # Explicit signatures: without them ctypes assumes int, which truncates the 64-bit HWND
+    _user32 = ctypes.windll.user32
+    _GetForegroundWindow = _user32.GetForegroundWindow
+    _GetForegroundWindow.argtypes = []
+    _GetForegroundWindow.restype = wintypes.HWND
+    _GetWindowTextLengthW = _user32.GetWindowTextLengthW
+    _GetWindowTextLengthW.argtypes = [wintypes.HWND]
+    _GetWindowTextLengthW.restype = ctypes.c_int
+    _GetWindowTextW = _user32.GetWindowTextW
+    _GetWindowTextW.argtypes = [wintypes.HWND, wintypes.LPWSTR, ctypes.c_int]
+    _GetWindowTextW.restype = ctypes.c_int
+
+    def _read_active_window_title():
+        hwnd = _GetForegroundWindow()
+        if not hwnd:
+            return None
+        length = _GetWindowTextLengthW(hwnd)
+        buffer = ctypes.create_unicode_buffer(length + 1)
+        _GetWindowTextW(hwnd, buffer, length + 1)
+        return buffer.value
+
+elif _PLATFORM == "Darwin":
+    from AppKit import NSWorkspace
+
+    def _read_active_window_title():
+        app = NSWorkspace.sharedWorkspace().frontmostApplication()
+        return app.localizedName() if app else None
+
+elif _PLATFORM == "Linux":
+    from Xlib import X, display as xdisplay
+
+    _x_display = None # Opened on first use so importing this module works without an X server
+
+    def _read_active_window_title():
+        global _x_display
+        if _x_display is None:
+            _x_display = xdisplay.Display()
+        root = _x_display.screen().root
+        active = root.get_full_property(_x_display.intern_atom("_NET_ACTIVE_WINDOW"), X.AnyPropertyType)
+        if not active or not active.value[0]:
+            return None
+        window = _x_display.create_resource_object("window", active.value[0])
+        name = window.get_full_property(_x_display.intern_atom("_NET_WM_NAME"), 0) or window.get_full_property(X.WM_NAME, 0)
+        if not name:
+            return ""
+        return name.value.decode("utf-8", "replace") if isinstance(name.value, bytes) else str(name.value)
+
+else:
+    import pygetwindow as gw
+
+    _get_active = gw.getActiveWindow # Bound once instead of a module attribute lookup per call
+
+    def _read_active_window_title():
+        active_window = _get_active()
+        return active_window.title if active_window else None
+
+# Consecutive polls almost always see the same window, so a title is reused for this long
+# instead of going back to the OS on every call.
+ACTIVE_WINDOW_CACHE_TTL_SECONDS = 0.25
+_last_title = None
+_last_title_time = 0.0
+
+def invalidate_active_window_cache():
+    """Forces the next get_active_window_title call to query the OS (e.g. on a foreground-change event)."""
+    global _last_title
+    _last_title = None
 
 def get_active_window_title():
     """Gets the title of the currently active window."""
+    global _last_title, _last_title_time
+    now = time.monotonic()
+    if _last_title is not None and now - _last_title_time < ACTIVE_WINDOW_CACHE_TTL_SECONDS:
+        return _last_title
+
     try:
-        active_window = gw.getActiveWindow()
-        if active_window:
-            return active_window.title
-        else:
+        title = _read_active_window_title()
+        if title is None:
             # Handle cases where there might not be an active window (e.g., background script)
-            return "No active window found"
+            title = "No active window found"
+        _last_title, _last_title_time = title, now
+        return title
     except Exception as e:
-        logging.error(f"Error getting active window title: {e}")
+        logger.error(f"Error getting active window title: {e}")
         # Fallback for specific platforms if needed, or return a default
-        if platform.system() == "Linux":
-             logging.warning("pygetwindow might have limitations on Linux Wayland.")
+        if _PLATFORM == "Linux":
+             logger.warning("Active window lookup uses X11 and may not work under Linux Wayland.")
         return "Error getting window title"
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
     # Example usage
     title = get_active_window_title()
     print(f"Active window: {title}")